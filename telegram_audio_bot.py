@@ -1,12 +1,31 @@
+import asyncio
+import hashlib
+import io
 import os
 import logging
-from telethon import TelegramClient, events
+import re
+import secrets
+import aiofiles
+from cachetools import TTLCache
+from telethon import Button, TelegramClient, events
+from telethon.extensions import markdown
 from telethon.tl.types import DocumentAttributeFilename
-import openai
-from fpdf import FPDF
+import diskcache
+import httpx
+from openai import AsyncOpenAI
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
 
+from FastTelethon import download_file as fast_download
+
 # Load environment variables
 load_dotenv()
 
@@ -16,6 +35,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Use libuv's C event loop when available; must be installed before the
+# Telethon client grabs the loop below (uvloop has no Windows build)
+try:
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    logger.warning("uvloop not installed, using the default asyncio event loop")
+
 # API Credentials from environment variables
 API_ID = os.getenv("API_ID")
 API_HASH = os.getenv("API_HASH")
@@ -28,77 +56,272 @@ if not all([API_ID, API_HASH, BOT_TOKEN, OPENAI_API_KEY]):
         "Missing required environment variables. Please check your .env file."
     )
 
-# Initialize OpenAI
-openai.api_key = OPENAI_API_KEY
+# Initialize OpenAI (async client so Whisper calls don't block the event loop).
+# All calls share one pooled HTTP/2 connection so TLS handshakes amortize
+# across transcriptions instead of repeating per request.
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=120,
+    limits=httpx.Limits(max_keepalive_connections=16),
+)
+aclient = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+# Transcription backend: "local" runs faster-whisper (CTranslate2) on this
+# machine for zero per-minute cost, "api" uses the hosted Whisper API
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "local").lower()
+WHISPER_DEVICE = os.getenv("WHISPER_DEVICE", "cpu")
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+
+# Short clips go to smaller local models: tiny is ~19x faster than medium
+# on CPU with negligible accuracy loss on short voice notes
+local_whisper_models = {}
+if WHISPER_BACKEND == "local":
+    try:
+        from faster_whisper import WhisperModel
+
+        for size in dict.fromkeys(("tiny", "base", WHISPER_MODEL_SIZE)):
+            local_whisper_models[size] = WhisperModel(
+                size,
+                device=WHISPER_DEVICE,
+                compute_type="float16" if WHISPER_DEVICE == "cuda" else "int8",
+            )
+        logger.info(f"Loaded local Whisper models: {', '.join(local_whisper_models)}")
+    except ImportError:
+        logger.warning(
+            "faster-whisper not installed, falling back to the OpenAI Whisper API"
+        )
+
+
+# Preflight speech detection: Whisper hallucinates text on pure silence and
+# still charges full latency/cost for it, so silent uploads are rejected
+# locally before any transcription is attempted
+vad_model = None
+try:
+    from silero_vad import get_speech_timestamps, load_silero_vad
+
+    vad_model = load_silero_vad(onnx=True)
+    logger.info("Loaded Silero VAD for speech preflight")
+except ImportError:
+    logger.warning("silero-vad not installed, skipping speech preflight")
+
+
+def detect_speech(audio: bytes) -> bool:
+    """Return whether the audio contains any speech (True when unsure)"""
+    try:
+        import torchaudio
+
+        wav, sample_rate = torchaudio.load(io.BytesIO(audio))
+        wav = wav.mean(dim=0)
+        if sample_rate != 16000:
+            wav = torchaudio.functional.resample(wav, sample_rate, 16000)
+        return bool(get_speech_timestamps(wav, vad_model))
+    except Exception as e:
+        logger.warning(f"VAD preflight failed, continuing to Whisper: {e}")
+        return True
+
+
+def pick_model_size(duration: int) -> str:
+    """Pick the smallest local model size suitable for a clip's duration"""
+    if duration and duration < 30:
+        return "tiny"
+    if duration and duration < 120:
+        return "base"
+    return WHISPER_MODEL_SIZE
 
 # Temporary directory for files
 TEMP_DIR = "temp_files"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Set KEEP_FILES=1 to also persist downloaded audio to TEMP_DIR
+KEEP_FILES = os.getenv("KEEP_FILES", "0") == "1"
+
+# Dedicated pool for file writes so they never queue behind transcription
+# batches in asyncio's shared default executor
+file_io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="file-io")
+
+# Persistent cache of transcriptions keyed by audio content hash (LRU, disk-backed)
+CACHE_SIZE_LIMIT = 5 * 1024**3  # 5 GB
+transcription_cache = diskcache.Cache(
+    os.path.join(TEMP_DIR, "whisper_cache"), size_limit=CACHE_SIZE_LIMIT
+)
+
+# How long finished transcriptions stay claimable via the inline buttons
+RESULT_TTL = 3600  # seconds
+
+# Generated files stay on disk for the logs/records, so TEMP_DIR needs a cap
+# or bursty load grows it until the filesystem fills
+TEMP_DIR_SIZE_LIMIT = 2 * 1024**3  # 2 GB
+JANITOR_INTERVAL = 60  # seconds
+
 # Initialize Telethon client
 bot = TelegramClient("audio_bot", API_ID, API_HASH)
 
 
-class TranscriptionPDF(FPDF):
-    def header(self):
-        self.set_font("Arial", "B", 16)
-        self.cell(0, 10, "Audio Transcription", 0, 1, "C")
-        self.ln(5)
+# Built once at import: stylesheet construction is identical per request
+_pdf_styles = getSampleStyleSheet()
+PDF_META_STYLE = _pdf_styles["Italic"]
+PDF_BODY_STYLE = _pdf_styles["BodyText"]
+
+# Use a Unicode font when available so transcriptions in non-Latin scripts
+# aren't mangled; the builtin Helvetica only covers latin-1
+_DEJAVU_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+if os.path.exists(_DEJAVU_PATH):
+    pdfmetrics.registerFont(TTFont("DejaVu", _DEJAVU_PATH))
+    PDF_META_STYLE.fontName = "DejaVu"
+    PDF_BODY_STYLE.fontName = "DejaVu"
+else:
+    logger.warning("DejaVuSans.ttf not found, PDF output limited to latin-1 glyphs")
+
+
+def _pdf_page_decorations(canvas, doc):
+    """Draw the title header and page-number footer on each PDF page"""
+    canvas.saveState()
+    canvas.setFont("Helvetica-Bold", 16)
+    canvas.drawCentredString(
+        doc.pagesize[0] / 2, doc.pagesize[1] - 15 * mm, "Audio Transcription"
+    )
+    canvas.setFont("Helvetica-Oblique", 8)
+    canvas.drawCentredString(doc.pagesize[0] / 2, 10 * mm, f"Page {canvas.getPageNumber()}")
+    canvas.restoreState()
+
+
+def hash_audio(audio: bytes) -> str:
+    """Compute a content hash of audio bytes for cache lookups"""
+    return hashlib.blake2b(audio).hexdigest()
+
+
+# Micro-batching for local transcription: concurrent uploads queue up and a
+# single worker drains them in one thread hop instead of one thread per upload
+TRANSCRIBE_BATCH_SIZE = 8
+TRANSCRIBE_BATCH_WAIT = 0.05  # seconds to linger for more jobs before running
+
+transcribe_queue: asyncio.Queue = asyncio.Queue()
 
-    def footer(self):
-        self.set_y(-15)
-        self.set_font("Arial", "I", 8)
-        self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
+# Per-user decoding hints: a known language lets Whisper skip its
+# language-ID pass and recent vocabulary biases the decoder's first tokens
+user_prefs: TTLCache = TTLCache(maxsize=1024, ttl=86400)
+PROMPT_TAIL = 200  # chars of the last transcription carried as the next prompt
 
 
-def transcribe_audio(audio_path: str) -> str:
-    """Transcribe audio using OpenAI Whisper API"""
+def _transcribe_local(audio: bytes, duration: int = 0, prefs: dict = None) -> tuple:
+    """Transcribe with a local model, returning (text, detected language)"""
+    prefs = prefs or {}
+    model = local_whisper_models[pick_model_size(duration)]
+    segments, info = model.transcribe(
+        io.BytesIO(audio),
+        vad_filter=True,
+        language=prefs.get("language"),
+        initial_prompt=prefs.get("prompt"),
+    )
+    text = " ".join(segment.text.strip() for segment in segments)
+    return text, info.language
+
+
+def _transcribe_local_batch(jobs):
+    """Run a batch of (audio, duration, prefs) jobs, returning a result each"""
+    results = []
+    for audio, duration, prefs in jobs:
+        try:
+            results.append(_transcribe_local(audio, duration, prefs))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+async def transcribe_worker():
+    """Drain queued transcription jobs and run them as batches"""
+    while True:
+        jobs = [await transcribe_queue.get()]
+        while len(jobs) < TRANSCRIBE_BATCH_SIZE:
+            try:
+                jobs.append(
+                    await asyncio.wait_for(
+                        transcribe_queue.get(), TRANSCRIBE_BATCH_WAIT
+                    )
+                )
+            except asyncio.TimeoutError:
+                break
+        results = await asyncio.to_thread(
+            _transcribe_local_batch,
+            [(audio, dur, prefs) for audio, dur, prefs, _ in jobs],
+        )
+        for (_, _, _, future), result in zip(jobs, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+async def transcribe_audio(
+    audio: bytes, filename: str, duration: int = 0, user_id: int = None
+) -> str:
+    """Transcribe audio bytes locally or via the OpenAI Whisper API"""
+    prefs = user_prefs.get(user_id, {})
     try:
-        with open(audio_path, "rb") as audio_file:
-            transcript = openai.audio.transcriptions.create(
-                model="whisper-1", file=audio_file, response_format="text"
-            )
+        if local_whisper_models:
+            future = asyncio.get_running_loop().create_future()
+            await transcribe_queue.put((audio, duration, prefs, future))
+            text, language = await future
+            if user_id is not None:
+                user_prefs[user_id] = {
+                    "language": language,
+                    "prompt": text[-PROMPT_TAIL:],
+                }
+            return text
+        hints = {k: prefs[k] for k in ("language", "prompt") if prefs.get(k)}
+        transcript = await aclient.audio.transcriptions.create(
+            model="whisper-1",
+            file=(filename, audio),
+            response_format="text",
+            **hints,
+        )
+        # The plain-text API response carries no detected language, so only
+        # the rolling vocabulary prompt is refreshed here
+        if user_id is not None:
+            user_prefs[user_id] = {
+                "language": prefs.get("language"),
+                "prompt": transcript[-PROMPT_TAIL:],
+            }
         return transcript
     except Exception as e:
         logger.error(f"Transcription error: {e}")
         raise
 
 
+async def write_txt(text: str, output_path: str):
+    """Write the transcription text file without blocking the event loop"""
+    ts = datetime.now().isoformat(sep=" ", timespec="seconds")
+    async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
+        await f.write(f"Audio Transcription\nDate: {ts}\n{'-'*50}\n\n{text}")
+
+
 def create_pdf(text: str, output_path: str):
     """Create PDF from transcribed text"""
-    pdf = TranscriptionPDF()
-    pdf.add_page()
+    doc = SimpleDocTemplate(output_path, pagesize=A4, topMargin=30 * mm)
 
     # Add metadata
-    pdf.set_font("Arial", "I", 10)
-    pdf.cell(0, 10, f'Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', 0, 1)
-    pdf.ln(5)
+    flowables = [
+        Paragraph(
+            f'Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}', PDF_META_STYLE
+        ),
+        Spacer(1, 5 * mm),
+    ]
 
     # Add transcription
-    pdf.set_font("Arial", "", 12)
-
-    # Handle text encoding and wrapping
-    try:
-        paragraphs = text.split("\n")
-        for para in paragraphs:
-            if para.strip():
-                pdf.multi_cell(
-                    0, 10, para.encode("latin-1", "replace").decode("latin-1")
-                )
-                pdf.ln(2)
-    except Exception as e:
-        logger.error(f"PDF encoding error: {e}")
-        pdf.multi_cell(
-            0, 10, "Error encoding some characters. Please check the text file."
-        )
-
-    pdf.output(output_path)
+    for para in text.split("\n"):
+        if para.strip():
+            flowables.append(Paragraph(escape(para), PDF_BODY_STYLE))
+
+    doc.build(
+        flowables,
+        onFirstPage=_pdf_page_decorations,
+        onLaterPages=_pdf_page_decorations,
+    )
 
 
-@bot.on(events.NewMessage(pattern="/start"))
-async def start_handler(event):
-    """Handle /start command"""
-    welcome_message = """
+WELCOME_MESSAGE = """
 **Welcome to Audio Transcription Bot**
 
 I can transcribe any audio file or voice message into text using advanced AI technology.
@@ -121,13 +344,17 @@ Simply send me an audio file or voice message and I'll transcribe it for you.
 
 Ready to transcribe? Send me an audio file now!
 """
-    await event.respond(welcome_message)
+WELCOME_TEXT, WELCOME_ENTITIES = markdown.parse(WELCOME_MESSAGE)
 
 
-@bot.on(events.NewMessage(pattern="/help"))
-async def help_handler(event):
-    """Handle /help command"""
-    help_message = """
+async def start_handler(event):
+    """Handle /start command"""
+    await event.respond(
+        WELCOME_TEXT, formatting_entities=WELCOME_ENTITIES, parse_mode=None
+    )
+
+
+HELP_MESSAGE = """
 **How to Use Audio Transcription Bot**
 
 **Step 1:** Send an audio file or voice message
@@ -158,13 +385,17 @@ You'll get two files:
 /languages - View supported languages
 /about - Learn about this bot
 """
-    await event.respond(help_message)
+HELP_TEXT, HELP_ENTITIES = markdown.parse(HELP_MESSAGE)
 
 
-@bot.on(events.NewMessage(pattern="/formats"))
-async def formats_handler(event):
-    """Handle /formats command"""
-    formats_message = """
+async def help_handler(event):
+    """Handle /help command"""
+    await event.respond(
+        HELP_TEXT, formatting_entities=HELP_ENTITIES, parse_mode=None
+    )
+
+
+FORMATS_MESSAGE = """
 **Supported Audio Formats**
 
 **Voice Messages:**
@@ -189,13 +420,17 @@ async def formats_handler(event):
 
 **Tip:** For best results, use lossless formats like WAV or FLAC when possible.
 """
-    await event.respond(formats_message)
+FORMATS_TEXT, FORMATS_ENTITIES = markdown.parse(FORMATS_MESSAGE)
 
 
-@bot.on(events.NewMessage(pattern="/languages"))
-async def languages_handler(event):
-    """Handle /languages command"""
-    languages_message = """
+async def formats_handler(event):
+    """Handle /formats command"""
+    await event.respond(
+        FORMATS_TEXT, formatting_entities=FORMATS_ENTITIES, parse_mode=None
+    )
+
+
+LANGUAGES_MESSAGE = """
 **Supported Languages (90+ Languages)**
 
 The bot automatically detects the language in your audio. No need to specify!
@@ -213,13 +448,17 @@ The AI automatically identifies the spoken language in your audio. You can even
 
 **Note:** Results may vary based on audio quality, accent, and speaking clarity.
 """
-    await event.respond(languages_message)
+LANGUAGES_TEXT, LANGUAGES_ENTITIES = markdown.parse(LANGUAGES_MESSAGE)
 
 
-@bot.on(events.NewMessage(pattern="/about"))
-async def about_handler(event):
-    """Handle /about command"""
-    about_message = """
+async def languages_handler(event):
+    """Handle /languages command"""
+    await event.respond(
+        LANGUAGES_TEXT, formatting_entities=LANGUAGES_ENTITIES, parse_mode=None
+    )
+
+
+ABOUT_MESSAGE = """
 **About Audio Transcription Bot**
 
 **Technology:**
@@ -250,16 +489,38 @@ Created for easy and accurate audio transcription needs.
 
 Have questions? Send a message to the developer.
 """
-    await event.respond(about_message)
+ABOUT_TEXT, ABOUT_ENTITIES = markdown.parse(ABOUT_MESSAGE)
+
+
+async def about_handler(event):
+    """Handle /about command"""
+    await event.respond(
+        ABOUT_TEXT, formatting_entities=ABOUT_ENTITIES, parse_mode=None
+    )
+
+
+# One compiled alternation matched per message, instead of Telethon running
+# a separate regex per registered command handler
+COMMAND_PATTERN = re.compile(r"^/(start|help|formats|languages|about)\b")
+
+COMMAND_HANDLERS = {
+    "start": start_handler,
+    "help": help_handler,
+    "formats": formats_handler,
+    "languages": languages_handler,
+    "about": about_handler,
+}
 
 
-@bot.on(events.NewMessage)
+@bot.on(events.NewMessage(pattern=COMMAND_PATTERN))
+async def command_handler(event):
+    """Dispatch commands through a single pattern and handler table"""
+    await COMMAND_HANDLERS[event.pattern_match.group(1)](event)
+
+
+@bot.on(events.NewMessage(func=lambda e: not (e.text or "").startswith("/")))
 async def audio_handler(event):
     """Handle audio messages"""
-    # Skip if it's a command
-    if event.message.text and event.message.text.startswith("/"):
-        return
-
     # Check if message contains audio or voice
     if not (
         event.message.voice
@@ -275,54 +536,76 @@ async def audio_handler(event):
         # Send processing message
         status_msg = await event.respond("Processing your audio... Please wait.")
 
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Generate a collision-free request id (timestamps clash when two
+        # messages land in the same second)
+        req_id = secrets.token_hex(6)
         user_id = event.sender_id
 
-        # Download audio file
+        # Name the audio (used for format detection and optional persistence)
         if event.message.voice:
-            audio_path = os.path.join(TEMP_DIR, f"voice_{user_id}_{timestamp}.ogg")
+            audio_name = f"voice_{req_id}.ogg"
         else:
             # Get file extension from mime type
             ext = event.message.document.mime_type.split("/")[-1]
-            audio_path = os.path.join(TEMP_DIR, f"audio_{user_id}_{timestamp}.{ext}")
-
-        await event.message.download_media(audio_path)
-        logger.info(f"Downloaded audio: {audio_path}")
+            audio_name = f"audio_{req_id}.{ext}"
 
-        # Update status
-        await status_msg.edit("Transcribing audio with AI...")
+        # Download with parallel part requests straight into memory, so the
+        # audio never takes a round trip through the filesystem
+        buf = io.BytesIO()
+        await fast_download(bot, event.message.document or event.message.voice, buf)
+        audio = buf.getvalue()
+        logger.info(f"Downloaded audio: {audio_name} ({len(audio)} bytes)")
 
-        # Transcribe audio
-        transcription = transcribe_audio(audio_path)
-        logger.info(f"Transcription completed for user {user_id}")
+        if KEEP_FILES:
+            async with aiofiles.open(os.path.join(TEMP_DIR, audio_name), "wb") as f:
+                await f.write(audio)
 
-        # Create text file
-        txt_path = os.path.join(TEMP_DIR, f"transcription_{user_id}_{timestamp}.txt")
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(f"Audio Transcription\n")
-            f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"{'-'*50}\n\n")
-            f.write(transcription)
+        # Check cache before hitting the Whisper API
+        audio_hash = hash_audio(audio)
+        transcription = transcription_cache.get(audio_hash)
 
-        # Create PDF
-        pdf_path = os.path.join(TEMP_DIR, f"transcription_{user_id}_{timestamp}.pdf")
-        create_pdf(transcription, pdf_path)
+        if transcription is not None:
+            logger.info(f"Cache hit for audio {audio_hash[:16]}")
+        else:
+            # Skip Whisper entirely when the clip contains no speech
+            if vad_model is not None and not await asyncio.to_thread(
+                detect_speech, audio
+            ):
+                await status_msg.edit(
+                    "No speech detected in this audio. "
+                    "Please check the recording and try again."
+                )
+                return
+
+            # Transcribe audio, updating the status while the API call runs
+            _, transcription = await asyncio.gather(
+                status_msg.edit("Transcribing audio with AI..."),
+                transcribe_audio(
+                    audio, audio_name, event.message.file.duration or 0, user_id
+                ),
+            )
+            transcription_cache.set(audio_hash, transcription)
+            logger.info(f"Transcription completed for user {user_id}")
 
-        # Update status
-        await status_msg.edit("Sending your transcription...")
+        # Stash the result so the inline buttons can build files on demand;
+        # most users only read the preview, so don't generate TXT/PDF eagerly
+        transcription_cache.set(f"result:{req_id}", transcription, expire=RESULT_TTL)
 
-        # Send files
+        # Send preview with on-demand file buttons
         await event.respond(
             f"**Transcription Complete!**\n\nPreview:\n{transcription[:500]}{'...' if len(transcription) > 500 else ''}",
-            file=[txt_path, pdf_path],
+            buttons=[
+                [
+                    Button.inline("Get TXT", data=f"txt:{req_id}"),
+                    Button.inline("Get PDF", data=f"pdf:{req_id}"),
+                ]
+            ],
         )
 
         # Delete status message
         await status_msg.delete()
 
-        # Files are saved in temp_files/ directory
-        logger.info(f"Files saved: {audio_path}, {txt_path}, {pdf_path}")
+        logger.info(f"Transcription delivered for request {req_id}")
 
     except Exception as e:
         logger.error(f"Error processing audio: {e}")
@@ -331,15 +614,107 @@ async def audio_handler(event):
         )
 
 
+@bot.on(events.CallbackQuery(pattern=rb"(txt|pdf):"))
+async def file_request_handler(event):
+    """Generate and send a TXT or PDF file when its button is pressed"""
+    try:
+        kind, _, req_id = event.data.decode().partition(":")
+        transcription = transcription_cache.get(f"result:{req_id}")
+
+        if transcription is None:
+            await event.answer(
+                "This transcription has expired. Please resend the audio.", alert=True
+            )
+            return
+
+        await event.answer("Preparing your file...")
+
+        file_path = os.path.join(TEMP_DIR, f"transcription_{req_id}.{kind}")
+        if kind == "txt":
+            await write_txt(transcription, file_path)
+        else:
+            await asyncio.get_running_loop().run_in_executor(
+                file_io_executor, create_pdf, transcription, file_path
+            )
+
+        # Stream the upload from disk in 512 KB parts rather than letting
+        # send_file slurp the whole file before the first part goes out
+        handle = await bot.upload_file(file_path, part_size_kb=512)
+        await event.respond(file=handle)
+        logger.info(f"Sent {kind.upper()} file for request {req_id}")
+
+    except Exception as e:
+        logger.error(f"Error sending file: {e}")
+        await event.answer("Error preparing the file. Please try again.", alert=True)
+
+
+def _evict_old_files() -> int:
+    """Delete oldest TEMP_DIR files until the directory is under its cap"""
+    entries = []
+    with os.scandir(TEMP_DIR) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    entries.sort()
+
+    removed = 0
+    for _, size, path in entries:
+        if total <= TEMP_DIR_SIZE_LIMIT:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+async def janitor():
+    """Periodically bound TEMP_DIR disk usage
+
+    Only loose files are touched; the whisper_cache subdirectory enforces
+    its own size_limit through diskcache.
+    """
+    while True:
+        await asyncio.sleep(JANITOR_INTERVAL)
+        try:
+            removed = await asyncio.to_thread(_evict_old_files)
+            if removed:
+                logger.info(f"Janitor removed {removed} old files from {TEMP_DIR}")
+        except Exception as e:
+            logger.error(f"Janitor error: {e}")
+
+
+# command_handler, audio_handler, file_request_handler. An accidental extra
+# registration (e.g. a re-imported module) would re-download and re-transcribe
+# every audio, so fail loudly at startup rather than silently doing 2x work.
+EXPECTED_HANDLER_COUNT = 3
+
+
 def main():
     """Main function to run the bot"""
+    handler_count = len(bot.list_event_handlers())
+    if handler_count != EXPECTED_HANDLER_COUNT:
+        raise RuntimeError(
+            f"Expected {EXPECTED_HANDLER_COUNT} event handlers, found "
+            f"{handler_count} - a handler is registered twice or missing"
+        )
+
     logger.info("Bot started successfully!")
     print("Bot is running... Press Ctrl+C to stop.")
     print(f"Files will be saved in: {os.path.abspath(TEMP_DIR)}")
 
     # Start the bot and run until disconnected
     bot.start(bot_token=BOT_TOKEN)
+    if local_whisper_models:
+        bot.loop.create_task(transcribe_worker())
+    bot.loop.create_task(janitor())
     bot.run_until_disconnected()
+    bot.loop.run_until_complete(http_client.aclose())
 
 
 if __name__ == "__main__":